@@ -0,0 +1,109 @@
+"""
+Latency-budget-aware choice of input resolution and model variant.
+
+Every model the server holds can run at its trained input size or any
+smaller step of ``IMGSZ_LADDER``. ``CostProfile`` keeps a measured per-frame
+latency for each (version, imgsz) pair, seeded by profiling when a model is
+warmed and refreshed from live traffic. Each loaded model tracks the
+estimated milliseconds of inference work queued or running on it, since
+every model serialises its own forward passes. ``choose`` keeps the active
+version at its trained size while that fits the request's budget, and
+otherwise steps down to the most expensive (the proxy for most accurate)
+configuration whose own cost plus that model's queue still fits, so a
+growing queue pushes requests to smaller inputs or an idle lighter model
+instead of past their deadline.
+"""
+
+import os
+import threading
+
+IMGSZ_LADDER = [int(s) for s in os.environ.get(
+    "SPACEGUARD_IMGSZ_LADDER", "640,512,416,320,256,224,192,160").split(",")]
+DEFAULT_BUDGET_MS = float(os.environ.get("SPACEGUARD_LATENCY_BUDGET_MS", 0)) or None
+EWMA_ALPHA = 0.2
+PROFILE_RUNS = 3
+
+
+def ladder_for(imgsz):
+    """Input sizes a model may run at: its trained size and every smaller ladder step."""
+    return sorted({imgsz, *(s for s in IMGSZ_LADDER if s < imgsz)}, reverse=True)
+
+
+class CostProfile:
+    def __init__(self, alpha=EWMA_ALPHA):
+        self.alpha = alpha
+        self._ms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, version, imgsz, ms):
+        key = (version, imgsz)
+        with self._lock:
+            previous = self._ms.get(key)
+            self._ms[key] = ms if previous is None else previous + self.alpha * (ms - previous)
+
+    def estimate(self, version, imgsz):
+        return self._ms.get((version, imgsz))
+
+    def forget(self, version):
+        with self._lock:
+            for key in [k for k in self._ms if k[0] == version]:
+                del self._ms[key]
+
+    def adopt(self, other, version):
+        """Replaces this profile's rows for ``version`` with those measured in ``other``."""
+        rows = {k: v for k, v in other._ms.items() if k[0] == version}
+        with self._lock:
+            for key in [k for k in self._ms if k[0] == version]:
+                del self._ms[key]
+            self._ms.update(rows)
+
+    def table(self):
+        with self._lock:
+            table = {}
+            for (version, imgsz), ms in sorted(self._ms.items()):
+                table.setdefault(version, {})[imgsz] = round(ms, 2)
+            return table
+
+
+def choose(models, costs, budget_ms):
+    """
+    Picks (model, imgsz, plan) for one request from the loaded ``models``,
+    the first of which is the active version. Each option is charged the
+    work already queued on its own model. Without a budget the active
+    version runs at its trained size. If nothing fits, the cheapest
+    configuration is used and the plan is marked ``over_budget``.
+    """
+    primary = models[0]
+
+    if budget_ms is None:
+        estimate = costs.estimate(primary.version, primary.imgsz)
+        return primary, primary.imgsz, {
+            "budget_ms": None, "queue_ms": round(primary.queue_ms, 2),
+            "version": primary.version, "imgsz": primary.imgsz,
+            "estimated_ms": round(estimate, 2) if estimate is not None else None,
+            "degraded": False, "over_budget": False,
+        }
+
+    options = []
+    for model in models:
+        for imgsz in model.sizes:
+            estimate = costs.estimate(model.version, imgsz)
+            if estimate is not None:
+                options.append((estimate, model, imgsz))
+    if not options:
+        # Nothing profiled yet (e.g. mid-reload), behave as if there were no budget
+        return choose(models, costs, None)
+
+    # Active version at its trained size first, then everything else from most to least expensive
+    options.sort(key=lambda o: (o[1] is primary and o[2] == primary.imgsz, o[0]), reverse=True)
+    fitting = [o for o in options if o[0] + o[1].queue_ms <= budget_ms]
+    estimate, model, imgsz = fitting[0] if fitting else min(
+        options, key=lambda o: o[0] + o[1].queue_ms)
+
+    return model, imgsz, {
+        "budget_ms": budget_ms, "queue_ms": round(model.queue_ms, 2),
+        "version": model.version, "imgsz": imgsz,
+        "estimated_ms": round(estimate, 2),
+        "degraded": model is not primary or imgsz != primary.imgsz,
+        "over_budget": not fitting,
+    }
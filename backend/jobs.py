@@ -0,0 +1,414 @@
+"""
+Asynchronous detection jobs for large submissions.
+
+Uploads (a video, a zip of images or a single image) are written to disk and
+recorded in a local SQLite queue, so submitting returns a job id at once and
+no HTTP connection is held open during inference. Worker threads claim jobs,
+run batched inference frame by frame and commit each batch's results together
+with the job's progress, so a restarted service resumes where it stopped.
+Finished results are kept for a retention window and then deleted.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+JOB_DIR = os.environ.get(
+    "SPACEGUARD_JOB_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs"))
+BATCH_SIZE = int(os.environ.get("SPACEGUARD_JOB_BATCH", 16))
+RETENTION_SECONDS = float(os.environ.get("SPACEGUARD_JOB_RETENTION_HOURS", 24)) * 3600
+MAX_ACTIVE_JOBS_PER_CLIENT = int(os.environ.get("SPACEGUARD_MAX_JOBS_PER_CLIENT", 2))
+POLL_INTERVAL = 1.0
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+
+ACTIVE_STATES = ("queued", "running")
+FINAL_STATES = ("done", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    client TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    filename TEXT,
+    input_path TEXT NOT NULL,
+    stride INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL,
+    total INTEGER,
+    processed INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    model_version TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    detections TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+# Columns added after the first release, for databases created before them
+MIGRATIONS = [
+    ("jobs", "errors", "INTEGER NOT NULL DEFAULT 0"),
+    ("results", "error", "TEXT"),
+    ("jobs", "filename", "TEXT"),
+]
+
+DECODE_ERROR = "Could not decode image"
+
+
+class JobError(Exception):
+    pass
+
+
+class JobLimitError(JobError):
+    pass
+
+
+class JobNotFoundError(JobError):
+    pass
+
+
+def job_kind(filename):
+    ext = os.path.splitext(filename.lower())[1]
+    if ext == ".zip":
+        return "zip"
+    if ext in VIDEO_EXTS:
+        return "video"
+    if ext in IMAGE_EXTS:
+        return "image"
+    raise JobError(f"Unsupported file type: {ext or filename}")
+
+
+# -----------------------------
+# Frame sources
+# -----------------------------
+def count_frames(kind, path, stride):
+    if kind == "image":
+        return 1
+    if kind == "zip":
+        with zipfile.ZipFile(path) as archive:
+            return len(zip_image_names(archive))
+    capture = cv2.VideoCapture(path)
+    frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    return (frames + stride - 1) // stride if frames > 0 else None
+
+
+def zip_image_names(archive):
+    return sorted(n for n in archive.namelist()
+                  if n.lower().endswith(IMAGE_EXTS) and not n.startswith("__MACOSX/"))
+
+
+def iter_frames(kind, path, stride=1, skip=0, filename=None):
+    """
+    Yields (name, BGR frame) pairs, skipping the first ``skip`` already-processed
+    frames. A single image is named after its uploaded ``filename``.
+    """
+    if kind == "image":
+        if skip == 0:
+            yield filename or os.path.basename(path), cv2.imread(path)
+    elif kind == "zip":
+        with zipfile.ZipFile(path) as archive:
+            for name in zip_image_names(archive)[skip:]:
+                data = np.frombuffer(archive.read(name), np.uint8)
+                yield name, cv2.imdecode(data, cv2.IMREAD_COLOR)
+    else:
+        capture = cv2.VideoCapture(path)
+        try:
+            if skip:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, skip * stride)
+            index = skip * stride
+            # grab() only demuxes; frames the stride skips are never decoded
+            while capture.grab():
+                if index % stride == 0:
+                    ok, frame = capture.retrieve()
+                    yield f"frame_{index:06d}", frame if ok else None
+                index += 1
+        finally:
+            capture.release()
+
+
+# -----------------------------
+# Persistent queue
+# -----------------------------
+class JobStore:
+    def __init__(self, root=JOB_DIR, max_active_per_client=MAX_ACTIVE_JOBS_PER_CLIENT,
+                 retention_seconds=RETENTION_SECONDS):
+        self.root = root
+        self.db_path = os.path.join(root, "jobs.db")
+        self.max_active_per_client = max_active_per_client
+        self.retention_seconds = retention_seconds
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            for table, column, definition in MIGRATIONS:
+                columns = [r["name"] for r in db.execute(f"PRAGMA table_info({table})")]
+                if column not in columns:
+                    db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def submit(self, client, filename, fileobj, stride=1):
+        kind = job_kind(filename)
+        job_id = uuid.uuid4().hex
+
+        with self._connect() as db:
+            active = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE client = ? AND status IN (?, ?)",
+                (client, *ACTIVE_STATES)).fetchone()[0]
+        if active >= self.max_active_per_client:
+            raise JobLimitError(
+                f"Client already has {active} active jobs (limit {self.max_active_per_client})")
+
+        os.makedirs(self.job_dir(job_id))
+        input_path = os.path.join(self.job_dir(job_id), "input" + os.path.splitext(filename)[1].lower())
+        with open(input_path, "wb") as buffer:
+            shutil.copyfileobj(fileobj, buffer)
+
+        with self._transaction() as db:
+            # Re-check inside the write lock so concurrent submits cannot both slip under the cap
+            active = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE client = ? AND status IN (?, ?)",
+                (client, *ACTIVE_STATES)).fetchone()[0]
+            if active >= self.max_active_per_client:
+                shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+                raise JobLimitError(
+                    f"Client already has {active} active jobs (limit {self.max_active_per_client})")
+            db.execute(
+                "INSERT INTO jobs (id, client, kind, filename, input_path, stride, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, client, kind, os.path.basename(filename), input_path, stride, time.time()))
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFoundError(f"Unknown job: {job_id}")
+        job = dict(row)
+        job.pop("input_path")
+        job["progress"] = round(job["processed"] / job["total"], 4) if job["total"] else None
+        return job
+
+    def results(self, job_id, after=-1, limit=500):
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT seq, name, detections, error FROM results WHERE job_id = ? AND seq > ? "
+                "ORDER BY seq LIMIT ?", (job_id, after, limit)).fetchall()
+        return [{"seq": r["seq"], "name": r["name"], "detections": json.loads(r["detections"]),
+                 "error": r["error"]} for r in rows]
+
+    def result_file(self, job_id):
+        return os.path.join(self.job_dir(job_id), "results.json")
+
+    def cancel(self, job_id):
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, expires_at = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                (time.time(), time.time() + self.retention_seconds, job_id, *ACTIVE_STATES))
+        return self.get(job_id)
+
+    # -----------------------------
+    # Worker side
+    # -----------------------------
+    def requeue_interrupted(self):
+        """Jobs left 'running' by a previous process go back to the queue and resume."""
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+
+    def claim(self):
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) "
+                       "WHERE id = ?", (time.time(), row["id"]))
+        return dict(row)
+
+    def set_total(self, job_id, total):
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+
+    def record_batch(self, job_id, start_seq, names, detections, model_version, errors=None):
+        """
+        Stores one batch and advances progress atomically; False if the job
+        was cancelled. ``errors`` holds a message for each frame that could
+        not be analysed (None otherwise).
+        """
+        errors = errors or [None] * len(names)
+        with self._transaction() as db:
+            status = db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if status is None or status["status"] != "running":
+                return False
+            db.executemany(
+                "INSERT OR REPLACE INTO results (job_id, seq, name, detections, error) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(job_id, start_seq + i, name, json.dumps(dets), error)
+                 for i, (name, dets, error) in enumerate(zip(names, detections, errors))])
+            db.execute("UPDATE jobs SET processed = ?, model_version = ?, "
+                       "errors = (SELECT COUNT(*) FROM results WHERE job_id = ? AND error IS NOT NULL) "
+                       "WHERE id = ?",
+                       (start_seq + len(names), model_version, job_id, job_id))
+        return True
+
+    def finish(self, job_id, error=None):
+        """
+        Marks a running job done or failed. A done job's results.json is
+        only published if the job was still running, so a job cancelled at
+        the last moment never gets a results file.
+        """
+        now = time.time()
+        tmp_path = self._write_result_file(job_id) if error is None else None
+        try:
+            with self._transaction() as db:
+                updated = db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, expires_at = ?, "
+                    "total = CASE WHEN ? IS NULL THEN processed ELSE total END "
+                    "WHERE id = ? AND status = 'running'",
+                    ("failed" if error else "done", error, now, now + self.retention_seconds,
+                     error, job_id)).rowcount
+                if updated and tmp_path:
+                    os.replace(tmp_path, self.result_file(job_id))
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return bool(updated)
+
+    def _write_result_file(self, job_id):
+        """Writes the final results to a temporary file and returns its path."""
+        tmp_path = self.result_file(job_id) + ".tmp"
+        job = self.get(job_id)
+        job.update(status="done", total=job["processed"], progress=1.0)
+        with open(tmp_path, "w") as f:
+            json.dump({"job": job, "results": self.results(job_id, limit=-1)}, f)
+        return tmp_path
+
+    def purge_expired(self):
+        with self._transaction() as db:
+            expired = [r["id"] for r in db.execute(
+                "SELECT id FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?",
+                (time.time(),))]
+            for job_id in expired:
+                db.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+                db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        for job_id in expired:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return len(expired)
+
+
+# -----------------------------
+# Workers
+# -----------------------------
+class JobWorkers:
+    def __init__(self, store, server, workers=1, batch_size=BATCH_SIZE):
+        self.store = store
+        self.server = server
+        self.workers = workers
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self.store.requeue_interrupted()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.store.purge_expired()
+            job = self.store.claim()
+            if job is None:
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            try:
+                if self.process(job):
+                    self.store.finish(job["id"])
+            except Exception as e:
+                self.store.finish(job["id"], error=str(e))
+
+    def process(self, job):
+        """Runs a job to completion; False if it was cancelled or the workers are stopping."""
+        if job["total"] is None:
+            self.store.set_total(job["id"], count_frames(job["kind"], job["input_path"], job["stride"]))
+
+        seq = job["processed"]
+        names, frames = [], []
+        for name, frame in iter_frames(job["kind"], job["input_path"], job["stride"], skip=seq,
+                                       filename=job["filename"]):
+            if self._stop.is_set():
+                return False
+            if frame is None and job["kind"] == "image":
+                raise JobError(DECODE_ERROR)
+            # Undecodable archive entries keep their slot (flagged with an error) so
+            # sequence numbers stay stable and they cannot pass for "nothing detected"
+            names.append(name)
+            frames.append(frame)
+            if len(frames) == self.batch_size:
+                if not self._flush(job["id"], seq, names, frames):
+                    return False
+                seq += len(frames)
+                names, frames = [], []
+        if frames:
+            return self._flush(job["id"], seq, names, frames)
+        return True
+
+    def _flush(self, job_id, seq, names, frames):
+        decoded = [frame for frame in frames if frame is not None]
+        with self.server.acquire() as loaded:
+            predicted = iter(loaded.predict_batch(decoded) if decoded else [])
+
+        detections, errors = [], []
+        for frame in frames:
+            detections.append([] if frame is None else next(predicted))
+            errors.append(DECODE_ERROR if frame is None else None)
+        return self.store.record_batch(job_id, seq, names, detections, loaded.version, errors)
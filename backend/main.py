@@ -1,51 +1,218 @@
-from fastapi import FastAPI, File, UploadFile
-from ultralytics import YOLO
-import shutil
-import uuid
+from fastapi import FastAPI, File, Header, HTTPException, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+import asyncio
+import cv2
+import json
 import os
+import numpy as np
+import time
 import uvicorn
 
+from adaptive import DEFAULT_BUDGET_MS
+from jobs import FINAL_STATES, JobError, JobLimitError, JobNotFoundError, JobStore, JobWorkers
+from registry import ModelRegistry, RegistryError, VersionNotFoundError
+from render import ENCODINGS, encode
+from serving import ModelServer
+
 app = FastAPI(title="SpaceGuard AI API")
 
-# Load model (ensure best.pt is in the same directory)
-model = YOLO("best.pt")
+# Load the registry's active model (falls back to best.pt in this directory)
+registry = ModelRegistry()
+server = ModelServer(registry)
+server.start()
+
+# Background workers for /jobs, resuming anything a previous run left unfinished
+job_store = JobStore()
+job_workers = JobWorkers(job_store, server, workers=int(os.environ.get("SPACEGUARD_JOB_WORKERS", 1)))
+job_workers.start()
+
+# Lighter variants (e.g. a yolov8n registry version) that budgeted requests may fall back to,
+# loaded in the background like /models/{version}/variant
+for variant in filter(None, os.environ.get("SPACEGUARD_VARIANTS", "").split(",")):
+    server.add_variant(variant.strip())
 
 @app.post("/detect")
-async def detect(file: UploadFile = File(...)):
-    # Create temp filename
-    ext = file.filename.split(".")[-1]
-    img_name = f"{uuid.uuid4()}.{ext}"
-    img_path = f"temp_{img_name}"
-
-    # Save uploaded file
-    with open(img_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Run inference
-    results = model(img_path)
-
-    # Process results
-    detections = []
-    for r in results:
-        for box in r.boxes:
-            class_id = int(box.cls[0])
-            class_name = model.names[class_id]
-            conf = float(box.conf[0])
-            bbox = box.xyxy[0].tolist()
-            
-            detections.append({
-                "class": class_name,
-                "confidence": conf,
-                "bbox": bbox
-            })
-
-    # Cleanup temp file
-    if os.path.exists(img_path):
-        os.remove(img_path)
+async def detect(file: UploadFile = File(...), annotated: bool = False,
+                 format: str = "jpeg", quality: int = 85, budget_ms: float = None):
+    if annotated and format not in ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(ENCODINGS)}")
+    if not 1 <= quality <= 100:
+        raise HTTPException(status_code=400, detail="quality must be in [1, 100]")
+    if budget_ms is None:
+        budget_ms = DEFAULT_BUDGET_MS
+    if budget_ms is not None and budget_ms <= 0:
+        raise HTTPException(status_code=400, detail="budget_ms must be > 0")
+
+    # Decode the upload in memory, the same frame can then be replayed on a shadow model
+    data = await file.read()
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+
+    # Pick the model and input size that fit the latency budget under the current load;
+    # the pick counts as queued work right away, before inference starts off the event loop
+    with server.acquire_for_budget(budget_ms) as (loaded, imgsz, config):
+        start = time.perf_counter()
+        detections, inference_ms = await run_in_threadpool(
+            loaded.predict_timed, frame, imgsz=imgsz, reserved=True)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    config["latency_ms"] = round(elapsed_ms, 2)
+
+    # Only the active version at its trained size is a fair baseline for the candidate
+    shadowed = not config["degraded"] and server.maybe_shadow(frame, detections, inference_ms)
+
+    if annotated:
+        # Draw in place unless the shadow model may still be reading the frame
+        start = time.perf_counter()
+        canvas = frame.copy() if shadowed else frame
+        content, media_type = await run_in_threadpool(
+            lambda: encode(loaded.renderer.draw(canvas, detections), format, quality))
+        render_ms = (time.perf_counter() - start) * 1000
+        return Response(content=content, media_type=media_type, headers={
+            "X-Model-Version": loaded.version,
+            "X-Imgsz": str(imgsz),
+            "X-Degraded": str(config["degraded"]).lower(),
+            # The full plan (budget, estimate, queue, over_budget, latency) as JSON
+            "X-Config": json.dumps(config),
+            "X-Detection-Count": str(len(detections)),
+            "X-Render-Ms": f"{render_ms:.2f}"
+        })
 
     return {
+        "model_version": loaded.version,
+        "config": config,
         "detections": detections
     }
 
+# -----------------------------
+# Model management
+# -----------------------------
+@app.get("/models")
+def list_models():
+    manifest = registry.load()
+    return {
+        "versions": manifest["versions"],
+        "serving": server.status()
+    }
+
+@app.post("/models/{version}/activate", status_code=202)
+def activate_model(version: str):
+    try:
+        return server.activate(version)
+    except VersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RegistryError as e:
+        # Another reload is already in progress
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/models/{version}/shadow", status_code=202)
+def shadow_model(version: str, sample_rate: float = 0.1):
+    if not 0 < sample_rate <= 1:
+        raise HTTPException(status_code=400, detail="sample_rate must be in (0, 1]")
+    try:
+        return server.start_shadow(version, sample_rate)
+    except RegistryError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/models/{version}/variant", status_code=202)
+def add_variant(version: str):
+    try:
+        return server.add_variant(version)
+    except VersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RegistryError as e:
+        # Already loading
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.delete("/models/{version}/variant")
+def remove_variant(version: str):
+    try:
+        return {"variants": server.remove_variant(version)}
+    except RegistryError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/models/shadow")
+def shadow_report():
+    return server.shadow_summary()
+
+@app.delete("/models/shadow")
+def stop_shadow():
+    return server.stop_shadow()
+
+# -----------------------------
+# Batch / video jobs
+# -----------------------------
+def get_job_or_404(job_id):
+    try:
+        return job_store.get(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: Request, file: UploadFile = File(...), stride: int = 1,
+               x_client_id: str = Header(None)):
+    if stride < 1:
+        raise HTTPException(status_code=400, detail="stride must be >= 1")
+    client = x_client_id or request.client.host
+    try:
+        return job_store.submit(client, file.filename, file.file, stride)
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except JobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return get_job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/results")
+def job_results(job_id: str, after: int = -1, limit: int = 500):
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be >= 1")
+    job = get_job_or_404(job_id)
+    return {"job": job, "results": job_store.results(job_id, after, min(limit, 5000))}
+
+@app.get("/jobs/{job_id}/stream")
+async def job_stream(job_id: str):
+    await run_in_threadpool(get_job_or_404, job_id)
+
+    async def events():
+        # Newline-delimited JSON: one line per processed frame, then a final status line.
+        # SQLite calls run in the threadpool so polling clients never block the event loop.
+        after = -1
+        while True:
+            try:
+                job = await run_in_threadpool(job_store.get, job_id)
+            except JobNotFoundError as e:
+                # Purged after its retention window while the client was still reading
+                yield json.dumps({"job": None, "error": str(e)}) + "\n"
+                return
+            rows = await run_in_threadpool(job_store.results, job_id, after)
+            for row in rows:
+                yield json.dumps(row) + "\n"
+            if rows:
+                after = rows[-1]["seq"]
+            elif job["status"] in FINAL_STATES:
+                yield json.dumps({"job": job}) + "\n"
+                return
+            else:
+                await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.get("/jobs/{job_id}/download")
+def job_download(job_id: str):
+    job = get_job_or_404(job_id)
+    path = job_store.result_file(job_id)
+    if job["status"] != "done" or not os.path.exists(path):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}, results not ready")
+    return FileResponse(path, media_type="application/json", filename=f"{job_id}.json")
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    get_job_or_404(job_id)
+    return job_store.cancel(job_id)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
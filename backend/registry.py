@@ -0,0 +1,246 @@
+"""
+Local model registry for SpaceGuard AI.
+
+Weights live in a registry directory next to a ``manifest.json`` that records,
+for every version, the weights file, its SHA-256 hash, the input size it was
+trained at and its validation metrics. The manifest also names the active
+version, so the serving layer never has to hard-code a weights path.
+
+Usage:
+    python registry.py register ../runs/detect/train6/weights/best.pt --version train6
+    python registry.py list
+    python registry.py activate train6
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import yaml
+
+REGISTRY_DIR = os.environ.get(
+    "SPACEGUARD_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+MANIFEST_NAME = "manifest.json"
+DEFAULT_IMGSZ = 640
+
+# Columns copied from an Ultralytics results.csv into the manifest
+METRIC_COLUMNS = {
+    "metrics/precision(B)": "precision",
+    "metrics/recall(B)": "recall",
+    "metrics/mAP50(B)": "mAP50",
+    "metrics/mAP50-95(B)": "mAP50-95",
+}
+
+
+class RegistryError(Exception):
+    pass
+
+
+class VersionNotFoundError(RegistryError):
+    pass
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_run_info(weights_path):
+    """
+    Reads imgsz, base architecture and final metrics from the Ultralytics run
+    directory a ``weights/best.pt`` file belongs to, if it is still there.
+    """
+    run_dir = os.path.dirname(os.path.dirname(os.path.abspath(weights_path)))
+    info = {"metrics": {}}
+
+    args_path = os.path.join(run_dir, "args.yaml")
+    if os.path.exists(args_path):
+        with open(args_path) as f:
+            args = yaml.safe_load(f) or {}
+        if args.get("imgsz"):
+            info["imgsz"] = int(args["imgsz"])
+        if args.get("model"):
+            info["arch"] = os.path.splitext(os.path.basename(str(args["model"])))[0]
+
+    results_path = os.path.join(run_dir, "results.csv")
+    if os.path.exists(results_path):
+        with open(results_path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        if rows:
+            last = {k.strip(): v for k, v in rows[-1].items()}
+            for column, key in METRIC_COLUMNS.items():
+                if last.get(column):
+                    info["metrics"][key] = float(last[column])
+
+    return info
+
+
+class ModelRegistry:
+    """Directory of versioned weights described by a JSON manifest."""
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Manifest I/O
+    # -----------------------------
+    def load(self):
+        if not os.path.exists(self.manifest_path):
+            return {"active": None, "versions": {}}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _save(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        # Atomic on POSIX and Windows, readers never see a half-written file
+        os.replace(tmp_path, self.manifest_path)
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def versions(self):
+        return self.load()["versions"]
+
+    def active_version(self):
+        return self.load()["active"]
+
+    def get(self, version):
+        entry = self.versions().get(version)
+        if entry is None:
+            raise VersionNotFoundError(f"Unknown model version: {version}")
+        return entry
+
+    def weights_path(self, version, verify=True):
+        """
+        Returns the absolute path of a version's weights, optionally checking
+        the file still matches the hash recorded when it was registered.
+        """
+        entry = self.get(version)
+        path = os.path.join(self.root, entry["file"])
+        if not os.path.exists(path):
+            raise RegistryError(f"Weights for {version} are missing: {path}")
+        if verify and file_sha256(path) != entry["sha256"]:
+            raise RegistryError(f"Hash mismatch for {version}: {path}")
+        return os.path.abspath(path)
+
+    # -----------------------------
+    # Mutations
+    # -----------------------------
+    def register(self, weights_path, version=None, imgsz=None, metrics=None,
+                 arch=None, activate=False):
+        if not os.path.exists(weights_path):
+            raise RegistryError(f"Weights file not found: {weights_path}")
+
+        run_info = read_run_info(weights_path)
+        sha256 = file_sha256(weights_path)
+        version = version or sha256[:12]
+
+        with self._lock:
+            manifest = self.load()
+            if version in manifest["versions"]:
+                raise RegistryError(f"Version already registered: {version}")
+
+            rel_file = os.path.join(version, os.path.basename(weights_path))
+            dest = os.path.join(self.root, rel_file)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copy2(weights_path, dest)
+
+            entry = {
+                "file": rel_file,
+                "sha256": sha256,
+                "imgsz": int(imgsz or run_info.get("imgsz") or DEFAULT_IMGSZ),
+                "arch": arch or run_info.get("arch"),
+                "metrics": {**run_info["metrics"], **(metrics or {})},
+                "source": os.path.abspath(weights_path),
+                "registered_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            manifest["versions"][version] = entry
+            if activate or manifest["active"] is None:
+                manifest["active"] = version
+            self._save(manifest)
+
+        return version, entry
+
+    def set_active(self, version):
+        with self._lock:
+            manifest = self.load()
+            if version not in manifest["versions"]:
+                raise VersionNotFoundError(f"Unknown model version: {version}")
+            manifest["active"] = version
+            self._save(manifest)
+
+
+def resolve_weights(version=None, fallback=None, root=REGISTRY_DIR):
+    """
+    Weights path for ``version`` (default: the active version). ``fallback``
+    is returned when no version is asked for and the registry is empty.
+    """
+    registry = ModelRegistry(root)
+    version = version or registry.active_version()
+    if version is None:
+        if fallback is None:
+            raise RegistryError(f"No active model in registry: {root}")
+        return fallback
+    return registry.weights_path(version)
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="SpaceGuard AI model registry")
+    parser.add_argument("--root", default=REGISTRY_DIR, help="Registry directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    reg = sub.add_parser("register", help="Copy weights into the registry")
+    reg.add_argument("weights")
+    reg.add_argument("--version")
+    reg.add_argument("--imgsz", type=int)
+    reg.add_argument("--arch", help="Base architecture, e.g. yolov8s")
+    reg.add_argument("--metric", action="append", default=[], metavar="NAME=VALUE")
+    reg.add_argument("--activate", action="store_true")
+
+    sub.add_parser("list", help="Show registered versions")
+
+    act = sub.add_parser("activate", help="Mark a version as active")
+    act.add_argument("version")
+
+    args = parser.parse_args()
+    registry = ModelRegistry(args.root)
+
+    if args.command == "register":
+        metrics = {}
+        for item in args.metric:
+            name, _, value = item.partition("=")
+            metrics[name] = float(value)
+        version, entry = registry.register(
+            args.weights, version=args.version, imgsz=args.imgsz,
+            metrics=metrics, arch=args.arch, activate=args.activate,
+        )
+        print(f"✅ Registered {version} ({entry['sha256'][:12]}, imgsz={entry['imgsz']})")
+    elif args.command == "list":
+        active = registry.active_version()
+        for version, entry in registry.versions().items():
+            marker = "*" if version == active else " "
+            print(f"{marker} {version:<16} imgsz={entry['imgsz']:<5} "
+                  f"arch={entry.get('arch') or '-':<10} metrics={entry['metrics']}")
+    elif args.command == "activate":
+        registry.set_active(args.version)
+        print(f"✅ Active model set to {args.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Fast rendering of detection results.
+
+Boxes and labels are drawn straight into the decoded frame buffer, in the
+frame's own channel order, so there is no PIL <-> NumPy or RGB <-> BGR
+conversion on the way. Label glyphs (filled background + text) are rendered
+once per class/confidence pair and then blitted with a slice assignment,
+and the frame is encoded exactly once.
+
+Benchmark:
+    python render.py --image ../data/preprocessed/test/images/<file>.jpg --boxes 20
+"""
+
+import argparse
+import time
+import zlib
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Distinct colours per class, defined in RGB
+PALETTE = [
+    (0, 200, 83),     # green
+    (41, 121, 255),   # blue
+    (255, 145, 0),    # orange
+    (213, 0, 249),    # purple
+    (255, 23, 68),    # red
+    (0, 229, 255),    # cyan
+    (255, 234, 0),    # yellow
+    (118, 255, 3),    # lime
+]
+
+ENCODINGS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, "image/jpeg"),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, "image/webp"),
+}
+
+
+class Renderer:
+    """
+    Draws detections (``{"class", "confidence", "bbox"}`` dicts) onto frames.
+
+    ``channel_order`` is the order of the frames it will draw on: "bgr" for
+    OpenCV-decoded images, "rgb" for arrays taken from PIL.
+    """
+
+    def __init__(self, names=None, channel_order="bgr", thickness=2, font_scale=0.5):
+        self.channel_order = channel_order
+        self.thickness = thickness
+        self.font_scale = font_scale
+        self.class_index = {}
+        if names:
+            items = names.items() if isinstance(names, dict) else enumerate(names)
+            self.class_index = {name: idx for idx, name in items}
+        self._colours = {}
+        self._glyphs = {}
+
+    def colour(self, class_name):
+        colour = self._colours.get(class_name)
+        if colour is None:
+            idx = self.class_index.get(class_name)
+            if idx is None:
+                idx = zlib.crc32(class_name.encode())
+            rgb = PALETTE[idx % len(PALETTE)]
+            colour = rgb if self.channel_order == "rgb" else rgb[::-1]
+            self._colours[class_name] = colour
+        return colour
+
+    def glyph(self, class_name, confidence):
+        """Pre-rendered label patch for one class/confidence pair, cached."""
+        label = f"{class_name} {confidence:.2f}"
+        patch = self._glyphs.get(label)
+        if patch is None:
+            (text_width, text_height), _ = cv2.getTextSize(label, FONT, self.font_scale, 1)
+            height = text_height + 10
+            patch = np.empty((height, text_width, 3), dtype=np.uint8)
+            patch[:] = self.colour(class_name)
+            cv2.putText(patch, label, (0, height - 5), FONT, self.font_scale, (0, 0, 0), 1)
+            self._glyphs[label] = patch
+        return patch
+
+    def draw(self, frame, detections):
+        """Draws in place on ``frame`` (HxWx3 uint8) and returns it."""
+        frame_h, frame_w = frame.shape[:2]
+        for det in detections:
+            x1, y1, x2, y2 = (int(v) for v in det["bbox"])
+            colour = self.colour(det["class"])
+            cv2.rectangle(frame, (x1, y1), (x2, y2), colour, self.thickness)
+
+            patch = self.glyph(det["class"], det["confidence"])
+            ph, pw = patch.shape[:2]
+            # Label sits above the box, or just inside it when the box touches the top edge
+            top = y1 - ph if y1 - ph >= 0 else max(y1, 0)
+            left = min(max(x1, 0), frame_w - 1)
+            bottom = min(top + ph, frame_h)
+            right = min(left + pw, frame_w)
+            if bottom > top and right > left:
+                frame[top:bottom, left:right] = patch[:bottom - top, :right - left]
+        return frame
+
+
+def encode(frame, fmt="jpeg", quality=85, channel_order="bgr"):
+    """Encodes a frame once; returns (bytes, media type)."""
+    if fmt not in ENCODINGS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    ext, quality_flag, media_type = ENCODINGS[fmt]
+    if channel_order == "rgb":
+        # OpenCV encoders expect BGR, reversing the channel axis is a view, not a copy
+        frame = frame[..., ::-1]
+    ok, buffer = cv2.imencode(ext, frame, [quality_flag, int(quality)])
+    if not ok:
+        raise ValueError(f"Could not encode image as {fmt}")
+    return buffer.tobytes(), media_type
+
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+def synthetic_detections(frame, count, names, seed=0):
+    rng = np.random.default_rng(seed)
+    h, w = frame.shape[:2]
+    detections = []
+    for _ in range(count):
+        x1, y1 = rng.integers(0, w - 20), rng.integers(0, h - 20)
+        x2, y2 = rng.integers(x1 + 10, w), rng.integers(y1 + 10, h)
+        detections.append({
+            "class": names[int(rng.integers(len(names)))],
+            "confidence": float(rng.uniform(0.25, 1.0)),
+            "bbox": [float(x1), float(y1), float(x2), float(y2)]
+        })
+    return detections
+
+
+def benchmark(frame, detections, fmt, quality, iterations):
+    renderer = Renderer(names=sorted({d["class"] for d in detections}))
+    render_ms, encode_ms = [], []
+    for _ in range(iterations):
+        canvas = frame.copy()
+        start = time.perf_counter()
+        renderer.draw(canvas, detections)
+        mid = time.perf_counter()
+        encode(canvas, fmt, quality)
+        end = time.perf_counter()
+        render_ms.append((mid - start) * 1000)
+        encode_ms.append((end - mid) * 1000)
+    return np.median(render_ms), np.median(encode_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark render + encode per frame")
+    parser.add_argument("--image", help="Image to draw on (default: blank 1280x720 frame)")
+    parser.add_argument("--boxes", type=int, default=20)
+    parser.add_argument("--format", default="jpeg", choices=sorted(ENCODINGS))
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.image:
+        frame = cv2.imread(args.image)
+        if frame is None:
+            raise SystemExit(f"Could not read image: {args.image}")
+    else:
+        frame = np.full((720, 1280, 3), 114, dtype=np.uint8)
+
+    names = ["OxygenTank", "NitrogenTank", "FirstAidBox", "FireAlarm",
+             "SafetySwitchPanel", "EmergencyPhone", "FireExtinguisher"]
+    detections = synthetic_detections(frame, args.boxes, names)
+    render_ms, encode_ms = benchmark(frame, detections, args.format, args.quality, args.iterations)
+
+    print(f"🖼️ Frame: {frame.shape[1]}x{frame.shape[0]}, {args.boxes} boxes, "
+          f"{args.format} q={args.quality}, {args.iterations} iterations")
+    print(f"Render:  {render_ms:.3f} ms/frame (median)")
+    print(f"Encode:  {encode_ms:.3f} ms/frame (median)")
+    print(f"Total:   {render_ms + encode_ms:.3f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
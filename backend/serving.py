@@ -0,0 +1,471 @@
+"""
+Model serving with zero-downtime hot reload.
+
+A ``ModelServer`` owns the model that answers requests. Activating a new
+registry version loads and warms it on a background thread, swaps it in
+atomically, and only releases the old model once every request that was
+already running on it has finished. A candidate version can also be
+shadow-run on a sample of live traffic to compare latency and detections
+before it is promoted, and lighter variants can be kept loaded so requests
+with a latency budget can be routed to them (see ``adaptive``).
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from ultralytics import YOLO
+
+from adaptive import PROFILE_RUNS, CostProfile, choose, ladder_for
+from registry import DEFAULT_IMGSZ, RegistryError
+from render import Renderer
+
+FALLBACK_WEIGHTS = "best.pt"
+WARMUP_RUNS = 2
+DRAIN_TIMEOUT = 60.0
+# Sampled frames allowed to wait for or run on the shadow model; further samples are skipped
+SHADOW_BACKLOG = 2
+
+
+def to_detections(result, names):
+    detections = []
+    for box in result.boxes:
+        class_id = int(box.cls[0])
+        detections.append({
+            "class": names[class_id],
+            "confidence": float(box.conf[0]),
+            "bbox": box.xyxy[0].tolist()
+        })
+    return detections
+
+
+def box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_rate(primary, candidate, iou_threshold=0.5):
+    """Fraction of primary detections the candidate also finds (same class, IoU >= threshold)."""
+    if not primary:
+        return 1.0 if not candidate else 0.0
+    matched = 0
+    for det in primary:
+        if any(c["class"] == det["class"] and box_iou(c["bbox"], det["bbox"]) >= iou_threshold
+               for c in candidate):
+            matched += 1
+    return matched / len(primary)
+
+
+class LoadedModel:
+    """A warmed model plus the count of requests currently using it."""
+
+    def __init__(self, version, model, imgsz, costs):
+        self.version = version
+        self.model = model
+        self.imgsz = imgsz
+        self.sizes = ladder_for(imgsz)
+        self.names = model.names
+        self.costs = costs
+        # Colours and label glyphs follow this version's class names
+        self.renderer = Renderer(names=self.names)
+        self.inflight = 0
+        self._idle = threading.Condition()
+        # Ultralytics predictors are not thread-safe, API requests and job workers take turns
+        self._predict_lock = threading.Lock()
+        # Estimated ms of work waiting for or holding this model's predict lock
+        self._queued_ms = 0.0
+        self._queue_lock = threading.Lock()
+
+    @property
+    def queue_ms(self):
+        return self._queued_ms
+
+    def reserve(self, ms):
+        with self._queue_lock:
+            self._queued_ms += ms
+
+    def release(self, ms):
+        with self._queue_lock:
+            self._queued_ms = max(0.0, self._queued_ms - ms)
+
+    def predict(self, frame, **kwargs):
+        return self.predict_batch([frame], **kwargs)[0]
+
+    def predict_timed(self, frame, **kwargs):
+        """Like ``predict``, plus the forward pass time in ms, not counting the wait for the lock."""
+        detections, elapsed_ms = self._forward([frame], **kwargs)
+        return detections[0], elapsed_ms
+
+    def predict_batch(self, frames, **kwargs):
+        """Runs one batched forward pass; returns a detection list per frame."""
+        return self._forward(frames, **kwargs)[0]
+
+    def _forward(self, frames, imgsz=None, reserved=False, **kwargs):
+        """
+        Returns (detections per frame, forward pass ms). The estimated cost
+        counts as work queued on this model until it finishes (``reserved``
+        means the caller already counted it), and single-frame timings
+        refresh the cost profile.
+        """
+        imgsz = imgsz or self.imgsz
+        frames = list(frames)
+        estimate = 0.0
+        if not reserved:
+            estimate = (self.costs.estimate(self.version, imgsz) or 0.0) * len(frames)
+            self.reserve(estimate)
+        try:
+            with self._predict_lock:
+                start = time.perf_counter()
+                results = self.model.predict(source=frames, imgsz=imgsz, verbose=False, **kwargs)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+        finally:
+            self.release(estimate)
+        if len(frames) == 1:
+            self.costs.observe(self.version, imgsz, elapsed_ms)
+        return [to_detections(r, self.names) for r in results], elapsed_ms
+
+    def enter(self):
+        with self._idle:
+            self.inflight += 1
+
+    def exit(self):
+        with self._idle:
+            self.inflight -= 1
+            if self.inflight == 0:
+                self._idle.notify_all()
+
+    def drain(self, timeout=DRAIN_TIMEOUT):
+        with self._idle:
+            return self._idle.wait_for(lambda: self.inflight == 0, timeout=timeout)
+
+
+class ShadowStats:
+    def __init__(self, version, sample_rate):
+        self.version = version
+        self.sample_rate = sample_rate
+        self.samples = 0
+        self.errors = 0
+        self.skipped = 0
+        self.primary_ms = 0.0
+        self.candidate_ms = 0.0
+        self.primary_detections = 0
+        self.candidate_detections = 0
+        self.match_rate = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, primary_ms, candidate_ms, primary, candidate):
+        with self._lock:
+            self.samples += 1
+            self.primary_ms += primary_ms
+            self.candidate_ms += candidate_ms
+            self.primary_detections += len(primary)
+            self.candidate_detections += len(candidate)
+            self.match_rate += match_rate(primary, candidate)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_skipped(self):
+        with self._lock:
+            self.skipped += 1
+
+    def summary(self):
+        with self._lock:
+            n = max(self.samples, 1)
+            return {
+                "version": self.version,
+                "sample_rate": self.sample_rate,
+                "samples": self.samples,
+                "errors": self.errors,
+                "skipped": self.skipped,
+                "primary_avg_ms": round(self.primary_ms / n, 2),
+                "candidate_avg_ms": round(self.candidate_ms / n, 2),
+                "primary_avg_detections": round(self.primary_detections / n, 2),
+                "candidate_avg_detections": round(self.candidate_detections / n, 2),
+                "avg_match_rate": round(self.match_rate / n, 3),
+            }
+
+
+class ModelServer:
+    def __init__(self, registry, warmup_runs=WARMUP_RUNS):
+        self.registry = registry
+        self.warmup_runs = warmup_runs
+        self._current = None
+        self._variants = {}
+        self.variant_status = {}
+        self.costs = CostProfile()
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.reload_status = {"state": "idle"}
+
+        # (model, stats) for the candidate, swapped as one tuple so readers never see a mixed pair
+        self._shadow = None
+        self._shadow_token = 0
+        self._shadow_lock = threading.Lock()
+        self.shadow_status = {"state": "idle"}
+        self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._shadow_slots = threading.BoundedSemaphore(SHADOW_BACKLOG)
+
+    # -----------------------------
+    # Loading
+    # -----------------------------
+    def _load(self, version):
+        """
+        Loads and warms ``version`` against a private CostProfile, so warm-up
+        and profiling never touch the live planner; ``_install`` publishes it.
+        """
+        costs = CostProfile()
+        if version is None:
+            # Registry is empty, fall back to the weights shipped next to the API
+            model = YOLO(FALLBACK_WEIGHTS)
+            loaded = LoadedModel("unregistered", model, DEFAULT_IMGSZ, costs)
+        else:
+            entry = self.registry.get(version)
+            model = YOLO(self.registry.weights_path(version))
+            loaded = LoadedModel(version, model, entry["imgsz"], costs)
+        self._warm(loaded)
+        return loaded
+
+    def _warm(self, loaded):
+        """Warms the model, then profiles every input size it may be asked to run at."""
+        for _ in range(self.warmup_runs):
+            loaded.predict(np.zeros((loaded.imgsz, loaded.imgsz, 3), dtype=np.uint8))
+        # Cold-start timings would skew the profile
+        loaded.costs.forget(loaded.version)
+        for size in loaded.sizes:
+            dummy = np.zeros((size, size, 3), dtype=np.uint8)
+            for _ in range(PROFILE_RUNS):
+                loaded.predict(dummy, imgsz=size)
+
+    def _install(self, loaded):
+        """Moves a warmed model's profile into the live planner; call under the swap lock."""
+        self.costs.adopt(loaded.costs, loaded.version)
+        loaded.costs = self.costs
+        return loaded
+
+    def start(self):
+        """Synchronously loads the registry's active version (or the fallback weights)."""
+        loaded = self._load(self.registry.active_version())
+        with self._swap_lock:
+            self._current = self._install(loaded)
+        return self._current
+
+    @property
+    def current(self):
+        return self._current
+
+    @contextmanager
+    def acquire(self):
+        """
+        Pins the current model for one request. The swap lock makes
+        "read current + count as in-flight" atomic with respect to a swap,
+        so a model can never be drained while a request is about to use it.
+        """
+        with self._swap_lock:
+            loaded = self._current
+            loaded.enter()
+        try:
+            yield loaded
+        finally:
+            loaded.exit()
+
+    @contextmanager
+    def acquire_for_budget(self, budget_ms=None):
+        """
+        Like ``acquire``, but picks the model and input size for a latency
+        budget from the active version and the loaded variants. Yields
+        (model, imgsz, plan); predict with ``reserved=True``.
+
+        The pick's estimated cost is queued on the model before the swap
+        lock is released and stays queued until the request is done, so
+        requests arriving together, or still waiting for a thread, see each
+        other's work.
+        """
+        with self._swap_lock:
+            models = [self._current] + [v for v in self._variants.values()
+                                        if v.version != self._current.version]
+            loaded, imgsz, plan = choose(models, self.costs, budget_ms)
+            estimate = self.costs.estimate(loaded.version, imgsz) or 0.0
+            loaded.reserve(estimate)
+            loaded.enter()
+        try:
+            yield loaded, imgsz, plan
+        finally:
+            loaded.release(estimate)
+            loaded.exit()
+
+    # -----------------------------
+    # Variants for budgeted requests
+    # -----------------------------
+    def add_variant(self, version):
+        """Starts loading a variant in the background; returns immediately."""
+        self.registry.get(version)
+        with self._swap_lock:
+            if self.variant_status.get(version, {}).get("state") == "loading":
+                raise RegistryError(f"Variant is already loading: {version}")
+            status = self.variant_status[version] = {"state": "loading", "version": version}
+        threading.Thread(target=self._load_variant, args=(version,), daemon=True).start()
+        return status
+
+    def _load_variant(self, version):
+        try:
+            loaded = self._load(version)
+        except Exception as e:
+            with self._swap_lock:
+                if version in self.variant_status:
+                    self.variant_status[version] = {"state": "failed", "version": version,
+                                                    "error": str(e)}
+            return
+        with self._swap_lock:
+            # Removed while it was loading
+            if self.variant_status.get(version, {}).get("state") != "loading":
+                return
+            old = self._variants.get(version)
+            self._variants[version] = self._install(loaded)
+            self.variant_status[version] = {"state": "ready", "version": version}
+        if old:
+            old.drain()
+
+    def remove_variant(self, version):
+        with self._swap_lock:
+            old = self._variants.pop(version, None)
+            status = self.variant_status.pop(version, None)
+            active = self._current.version if self._current else None
+        if old is None and status is None:
+            raise RegistryError(f"Not a loaded variant: {version}")
+        if old:
+            old.drain()
+        if version != active:
+            self.costs.forget(version)
+        return self.variant_versions()
+
+    def variant_versions(self):
+        return sorted(self._variants)
+
+    # -----------------------------
+    # Hot reload
+    # -----------------------------
+    def activate(self, version):
+        """Starts loading ``version`` in the background; returns immediately."""
+        self.registry.get(version)
+        if not self._reload_lock.acquire(blocking=False):
+            raise RegistryError("Another model reload is already in progress")
+        self.reload_status = {"state": "loading", "version": version}
+        threading.Thread(target=self._reload, args=(version,), daemon=True).start()
+        return self.reload_status
+
+    def _reload(self, version):
+        try:
+            loaded = self._load(version)
+
+            with self._swap_lock:
+                old, self._current = self._current, self._install(loaded)
+            self.registry.set_active(version)
+
+            self.reload_status = {"state": "draining", "version": version,
+                                  "previous": old.version if old else None}
+            drained = old.drain() if old else True
+            if old and old.version != version and old.version not in self._variants:
+                self.costs.forget(old.version)
+            self.reload_status = {"state": "done", "version": version,
+                                  "previous": old.version if old else None,
+                                  "drained": drained}
+        except Exception as e:
+            self.reload_status = {"state": "failed", "version": version, "error": str(e)}
+        finally:
+            self._reload_lock.release()
+
+    # -----------------------------
+    # Shadow traffic
+    # -----------------------------
+    def start_shadow(self, version, sample_rate=0.1):
+        """Starts loading a candidate in the background; any previous shadow stops at once."""
+        self.registry.get(version)
+        with self._shadow_lock:
+            self._shadow_token += 1
+            token = self._shadow_token
+            self._shadow = None
+            self.shadow_status = {"state": "loading", "version": version, "sample_rate": sample_rate}
+        threading.Thread(target=self._load_shadow, args=(token, version, sample_rate),
+                         daemon=True).start()
+        return self.shadow_status
+
+    def _load_shadow(self, token, version, sample_rate):
+        try:
+            # Never installed: the candidate keeps its own CostProfile and queue, so none
+            # of its work reaches the live planner and stopping it discards both
+            loaded = self._load(version)
+        except Exception as e:
+            with self._shadow_lock:
+                if token == self._shadow_token:
+                    self.shadow_status = {"state": "failed", "version": version, "error": str(e)}
+            return
+        with self._shadow_lock:
+            # A newer start/stop call superseded this load
+            if token != self._shadow_token:
+                return
+            self._shadow = (loaded, ShadowStats(version, sample_rate))
+            self.shadow_status = {"state": "running", "version": version, "sample_rate": sample_rate}
+
+    def stop_shadow(self):
+        with self._shadow_lock:
+            self._shadow_token += 1
+            shadow, self._shadow = self._shadow, None
+            status, self.shadow_status = self.shadow_status, {"state": "idle"}
+        return {**status, **shadow[1].summary()} if shadow else status
+
+    def shadow_summary(self):
+        shadow, status = self._shadow, self.shadow_status
+        return {**status, **shadow[1].summary()} if shadow else status
+
+    def maybe_shadow(self, frame, primary, primary_ms):
+        """
+        Replays a sampled request on the shadow model without delaying the
+        response. Samples arriving while the shadow worker is backed up are
+        skipped (and counted) rather than queued, so a slow candidate cannot
+        pile up frames in memory. Returns True when ``frame`` was handed to
+        the shadow worker.
+        """
+        current = self._shadow
+        if current is None:
+            return False
+        shadow, stats = current
+        if random.random() >= stats.sample_rate:
+            return False
+        if not self._shadow_slots.acquire(blocking=False):
+            stats.record_skipped()
+            return False
+        self._shadow_pool.submit(self._run_shadow, shadow, stats, frame, primary, primary_ms)
+        return True
+
+    def _run_shadow(self, shadow, stats, frame, primary, primary_ms):
+        try:
+            candidate, candidate_ms = shadow.predict_timed(frame)
+            stats.record(primary_ms, candidate_ms, primary, candidate)
+        except Exception:
+            stats.record_error()
+        finally:
+            self._shadow_slots.release()
+
+    def status(self):
+        current = self._current
+        queues = {v.version: v.queue_ms for v in self._variants.values()}
+        if current:
+            queues[current.version] = current.queue_ms
+        return {
+            "active": current.version if current else None,
+            "imgsz": current.imgsz if current else None,
+            "inflight": current.inflight if current else 0,
+            "reload": self.reload_status,
+            "shadow": self.shadow_summary(),
+            "variants": dict(self.variant_status),
+            "costs_ms": self.costs.table(),
+            "queue_ms": {version: round(ms, 2) for version, ms in sorted(queues.items())},
+        }
@@ -0,0 +1,67 @@
+import importlib
+import os
+import sys
+import tempfile
+import time
+import types
+
+import pytest
+
+# Backend modules import each other as top-level modules (they run from backend/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Keep the API's module-level registry and job queue out of backend/models and backend/jobs
+_scratch = tempfile.mkdtemp(prefix="spaceguard-tests-")
+os.environ["SPACEGUARD_MODEL_DIR"] = os.path.join(_scratch, "models")
+os.environ["SPACEGUARD_JOB_DIR"] = os.path.join(_scratch, "jobs")
+
+try:
+    import ultralytics  # noqa: F401
+except ImportError:
+    # serving imports YOLO at module level; tests that load models patch in FakeYOLO
+    sys.modules["ultralytics"] = types.ModuleType("ultralytics")
+    sys.modules["ultralytics"].YOLO = None
+
+
+class FakeBoxes(list):
+    pass
+
+
+class FakeResult:
+    def __init__(self):
+        self.boxes = FakeBoxes()
+
+
+class FakeYOLO:
+    """Stands in for ultralytics.YOLO: no detections, ``delay_ms`` per frame at 640."""
+
+    delay_ms = 0.0
+    names = {0: "FireAlarm", 1: "OxygenTank"}
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    def predict(self, source=None, imgsz=640, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        if self.delay_ms:
+            time.sleep(self.delay_ms * len(frames) * (imgsz / 640) ** 2 / 1000)
+        return [FakeResult() for _ in frames]
+
+
+@pytest.fixture
+def fake_yolo(monkeypatch):
+    import serving
+    monkeypatch.setattr(serving, "YOLO", FakeYOLO)
+    monkeypatch.setattr(FakeYOLO, "delay_ms", 0.0)
+    return FakeYOLO
+
+
+@pytest.fixture
+def api(fake_yolo):
+    """The FastAPI app, imported once with fake weights, and a test client for it."""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    main = importlib.import_module("main")
+    return main, TestClient(main.app)
@@ -0,0 +1,94 @@
+import pytest
+
+from adaptive import CostProfile, choose, ladder_for
+
+
+class FakeModel:
+    def __init__(self, version, imgsz, queue_ms=0.0):
+        self.version = version
+        self.imgsz = imgsz
+        self.sizes = ladder_for(imgsz)
+        self.queue_ms = queue_ms
+
+
+def profile(rows):
+    costs = CostProfile()
+    for (version, imgsz), ms in rows.items():
+        costs.observe(version, imgsz, ms)
+    return costs
+
+
+ROWS = {("s", 640): 40.0, ("s", 512): 26.0, ("s", 320): 10.0,
+        ("n", 640): 15.0, ("n", 320): 4.0}
+
+
+def test_ladder_keeps_trained_size_and_smaller_steps():
+    assert ladder_for(600)[0] == 600
+    assert all(s < 600 for s in ladder_for(600)[1:])
+
+
+def test_observe_smooths_with_ewma():
+    costs = CostProfile(alpha=0.5)
+    costs.observe("s", 640, 10.0)
+    costs.observe("s", 640, 20.0)
+    assert costs.estimate("s", 640) == pytest.approx(15.0)
+    assert costs.table() == {"s": {640: 15.0}}
+
+
+def test_forget_and_adopt_replace_one_version():
+    costs = profile(ROWS)
+    fresh = profile({("s", 640): 30.0})
+    costs.adopt(fresh, "s")
+    assert costs.table()["s"] == {640: 30.0}
+    costs.forget("n")
+    assert "n" not in costs.table()
+
+
+def test_no_budget_runs_primary_at_trained_size():
+    primary = FakeModel("s", 640, queue_ms=500.0)
+    model, imgsz, plan = choose([primary, FakeModel("n", 640)], profile(ROWS), None)
+    assert (model, imgsz) == (primary, 640)
+    assert plan["degraded"] is False
+
+
+def test_primary_preferred_while_it_fits():
+    primary = FakeModel("s", 640)
+    model, imgsz, plan = choose([primary, FakeModel("n", 640)], profile(ROWS), 50)
+    assert (model, imgsz) == (primary, 640)
+    assert plan["over_budget"] is False
+
+
+def test_steps_down_to_most_expensive_fitting_size():
+    primary = FakeModel("s", 640)
+    model, imgsz, plan = choose([primary], profile(ROWS), 30)
+    assert (model.version, imgsz) == ("s", 512)
+    assert plan["degraded"] is True
+
+
+def test_queue_on_primary_routes_to_idle_variant():
+    primary = FakeModel("s", 640, queue_ms=100.0)
+    variant = FakeModel("n", 640)
+    model, imgsz, plan = choose([primary, variant], profile(ROWS), 50)
+    assert (model, imgsz) == (variant, 640)
+    assert plan["queue_ms"] == 0.0
+
+
+def test_queue_on_variant_does_not_degrade_primary():
+    primary = FakeModel("s", 640)
+    variant = FakeModel("n", 640, queue_ms=1000.0)
+    model, _, _ = choose([primary, variant], profile(ROWS), 50)
+    assert model is primary
+
+
+def test_nothing_fits_uses_soonest_option_over_budget():
+    primary = FakeModel("s", 640, queue_ms=100.0)
+    model, imgsz, plan = choose([primary], profile(ROWS), 5)
+    assert (model, imgsz) == (primary, 320)
+    assert plan["over_budget"] is True
+
+
+def test_unprofiled_models_behave_as_unbudgeted():
+    primary = FakeModel("s", 640)
+    model, imgsz, plan = choose([primary], CostProfile(), 5)
+    assert (model, imgsz) == (primary, 640)
+    assert plan["over_budget"] is False
@@ -0,0 +1,175 @@
+import io
+import os
+import zipfile
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+import pytest
+
+from jobs import DECODE_ERROR, JobError, JobLimitError, JobStore, JobWorkers, iter_frames
+
+
+def make_zip(values, corrupt=()):
+    """Zip of flat grey PNGs; each frame's pixel value identifies it."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for i, value in enumerate(values):
+            data = cv2.imencode(".png", np.full((8, 8, 3), value, np.uint8))[1].tobytes()
+            archive.writestr(f"img{i:02d}.png", data)
+        for name in corrupt:
+            archive.writestr(name, b"not an image")
+    buffer.seek(0)
+    return buffer
+
+
+class FakeModel:
+    version = "fake"
+
+    def __init__(self, after_batch=None):
+        self.seen = []
+        self.after_batch = after_batch
+
+    def predict_batch(self, frames):
+        values = [int(frame[0, 0, 0]) for frame in frames]
+        self.seen.extend(values)
+        if self.after_batch:
+            self.after_batch()
+        return [[{"class": str(v), "confidence": 1.0, "bbox": [0, 0, 1, 1]}] for v in values]
+
+
+class FakeServer:
+    def __init__(self, model):
+        self.model = model
+
+    @contextmanager
+    def acquire(self):
+        yield self.model
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path), max_active_per_client=2, retention_seconds=3600)
+
+
+def run_claimed(store, model, batch_size=2):
+    workers = JobWorkers(store, FakeServer(model), batch_size=batch_size)
+    job = store.claim()
+    if workers.process(job):
+        store.finish(job["id"])
+    return workers, job
+
+
+def test_submit_caps_active_jobs_per_client(store):
+    store.submit("a", "one.zip", make_zip([1]))
+    store.submit("a", "two.zip", make_zip([1]))
+    with pytest.raises(JobLimitError):
+        store.submit("a", "three.zip", make_zip([1]))
+    # Other clients have their own allowance
+    assert store.submit("b", "one.zip", make_zip([1]))["status"] == "queued"
+
+
+def test_submit_rejects_unsupported_files(store):
+    with pytest.raises(JobError):
+        store.submit("a", "notes.txt", io.BytesIO(b"x"))
+
+
+def test_claim_takes_oldest_queued_job(store):
+    first = store.submit("a", "one.zip", make_zip([1]))
+    store.submit("b", "two.zip", make_zip([1]))
+    claimed = store.claim()
+    assert claimed["id"] == first["id"]
+    assert store.get(first["id"])["status"] == "running"
+
+
+def test_claim_returns_none_when_queue_is_empty(store):
+    assert store.claim() is None
+
+
+def test_interrupted_job_resumes_after_last_committed_batch(store):
+    values = [10, 20, 30, 40, 50]
+    job = store.submit("a", "survey.zip", make_zip(values))
+
+    # First process stops after committing one batch of two frames
+    holder = {}
+    first = FakeModel(after_batch=lambda: holder["workers"]._stop.set())
+    holder["workers"] = JobWorkers(store, FakeServer(first), batch_size=2)
+    assert holder["workers"].process(store.claim()) is False
+    assert store.get(job["id"])["processed"] == 2
+
+    # Restart: running jobs go back to the queue and skip what is already stored
+    store.requeue_interrupted()
+    second = FakeModel()
+    run_claimed(store, second)
+
+    assert second.seen == [30, 40, 50]
+    results = store.results(job["id"])
+    assert [r["seq"] for r in results] == [0, 1, 2, 3, 4]
+    assert [r["detections"][0]["class"] for r in results] == [str(v) for v in values]
+    finished = store.get(job["id"])
+    assert finished["status"] == "done"
+    assert os.path.exists(store.result_file(job["id"]))
+
+
+def test_undecodable_entries_are_flagged_not_reported_empty(store):
+    job = store.submit("a", "survey.zip", make_zip([10], corrupt=["zz_broken.jpg"]))
+    run_claimed(store, FakeModel())
+
+    results = store.results(job["id"])
+    assert results[0]["error"] is None
+    assert results[1] == {"seq": 1, "name": "zz_broken.jpg", "detections": [], "error": DECODE_ERROR}
+    assert store.get(job["id"])["errors"] == 1
+
+
+def test_undecodable_single_image_fails_the_job(store):
+    job = store.submit("a", "photo.jpg", io.BytesIO(b"not an image"))
+    workers = JobWorkers(store, FakeServer(FakeModel()))
+    claimed = store.claim()
+    with pytest.raises(JobError):
+        workers.process(claimed)
+    store.finish(job["id"], error=DECODE_ERROR)
+    assert store.get(job["id"])["status"] == "failed"
+
+
+def test_cancelled_job_stops_and_gets_no_results_file(store):
+    job = store.submit("a", "survey.zip", make_zip([10, 20, 30]))
+    claimed = store.claim()
+    store.cancel(job["id"])
+
+    workers = JobWorkers(store, FakeServer(FakeModel()), batch_size=2)
+    assert workers.process(claimed) is False
+    assert store.finish(job["id"]) is False
+    assert store.get(job["id"])["status"] == "cancelled"
+    assert not os.path.exists(store.result_file(job["id"]))
+
+
+def test_purge_removes_expired_jobs(tmp_path):
+    store = JobStore(str(tmp_path), retention_seconds=-1)
+    job = store.submit("a", "survey.zip", make_zip([10]))
+    run_claimed(store, FakeModel())
+
+    assert store.purge_expired() == 1
+    assert not os.path.exists(store.job_dir(job["id"]))
+    with pytest.raises(JobError):
+        store.get(job["id"])
+
+
+def test_video_stride_and_resume(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 32))
+    for i in range(10):
+        writer.write(np.full((32, 32, 3), i * 20, np.uint8))
+    writer.release()
+
+    assert [name for name, _ in iter_frames("video", path, stride=3)] == [
+        "frame_000000", "frame_000003", "frame_000006", "frame_000009"]
+    assert [name for name, _ in iter_frames("video", path, stride=3, skip=2)] == [
+        "frame_000006", "frame_000009"]
+
+
+def test_single_image_result_uses_uploaded_filename(store):
+    data = cv2.imencode(".png", np.full((8, 8, 3), 10, np.uint8))[1].tobytes()
+    job = store.submit("a", "uploads/dock_04.png", io.BytesIO(data))
+    assert job["filename"] == "dock_04.png"
+    run_claimed(store, FakeModel())
+    assert [r["name"] for r in store.results(job["id"])] == ["dock_04.png"]
@@ -0,0 +1,83 @@
+import json
+import time
+
+import cv2
+import numpy as np
+
+from adaptive import CostProfile
+
+IMAGE = cv2.imencode(".jpg", np.zeros((64, 64, 3), np.uint8))[1].tobytes()
+
+
+def detect(client, query=""):
+    return client.post(f"/detect{query}", files={"file": ("a.jpg", IMAGE, "image/jpeg")})
+
+
+def test_unknown_version_is_404_everywhere(api):
+    _, client = api
+    assert client.post("/models/nope/activate").status_code == 404
+    assert client.post("/models/nope/shadow").status_code == 404
+    assert client.post("/models/nope/variant").status_code == 404
+
+
+def test_activate_while_reloading_is_409(api, tmp_path):
+    main, client = api
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"weights")
+    main.registry.register(str(weights), version="busy-reload")
+
+    main.server._reload_lock.acquire()
+    try:
+        assert client.post("/models/busy-reload/activate").status_code == 409
+    finally:
+        main.server._reload_lock.release()
+
+
+
+def test_only_full_size_primary_requests_are_shadowed(api, monkeypatch):
+    main, client = api
+    calls = []
+    monkeypatch.setattr(main.server, "maybe_shadow",
+                        lambda frame, detections, primary_ms: calls.append(primary_ms) or False)
+    current = main.server.current
+    profile = CostProfile()
+    profile.observe(current.version, current.imgsz, 50.0)
+    profile.observe(current.version, 160, 1.0)
+    main.server.costs.adopt(profile, current.version)
+
+    degraded = detect(client, "?budget_ms=10").json()["config"]
+    assert degraded["degraded"] is True
+    assert calls == []
+
+    full = detect(client).json()["config"]
+    assert full["degraded"] is False
+    assert len(calls) == 1
+
+
+def test_annotated_response_carries_the_whole_config(api):
+    _, client = api
+    response = detect(client, "?annotated=true&budget_ms=1000")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    config = json.loads(response.headers["x-config"])
+    assert {"budget_ms", "queue_ms", "version", "imgsz", "estimated_ms",
+            "degraded", "over_budget", "latency_ms"} <= set(config)
+    assert config["budget_ms"] == 1000
+
+
+def test_variant_is_added_in_the_background(api, tmp_path):
+    main, client = api
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"light weights")
+    main.registry.register(str(weights), version="light", imgsz=320)
+
+    response = client.post("/models/light/variant")
+    assert response.status_code == 202
+    assert response.json()["state"] == "loading"
+    deadline = time.monotonic() + 5
+    while main.server.variant_status["light"]["state"] == "loading" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.get("/models").json()["serving"]["variants"]["light"]["state"] == "ready"
+
+    assert client.delete("/models/light/variant").json() == {"variants": []}
+    assert "light" not in client.get("/models").json()["serving"]["costs_ms"]
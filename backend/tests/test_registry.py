@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from registry import (DEFAULT_IMGSZ, ModelRegistry, RegistryError, VersionNotFoundError,
+                      file_sha256, read_run_info, resolve_weights)
+
+
+def make_run(tmp_path, name="train6", imgsz=512, with_logs=True):
+    """An Ultralytics-style run directory: weights/best.pt plus args.yaml and results.csv."""
+    run = tmp_path / name
+    (run / "weights").mkdir(parents=True)
+    weights = run / "weights" / "best.pt"
+    weights.write_bytes(name.encode())
+    if with_logs:
+        (run / "args.yaml").write_text(f"imgsz: {imgsz}\nmodel: yolov8s.pt\n")
+        (run / "results.csv").write_text(
+            "   epoch,  metrics/precision(B),  metrics/mAP50(B)\n"
+            "       1,               0.5,           0.4\n"
+            "       2,               0.8,           0.7\n")
+    return str(weights)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(str(tmp_path / "models"))
+
+
+def test_read_run_info_uses_args_and_last_results_row(tmp_path):
+    info = read_run_info(make_run(tmp_path))
+    assert info == {"imgsz": 512, "arch": "yolov8s",
+                    "metrics": {"precision": 0.8, "mAP50": 0.7}}
+
+
+def test_read_run_info_without_run_files(tmp_path):
+    assert read_run_info(make_run(tmp_path, with_logs=False)) == {"metrics": {}}
+
+
+def test_register_copies_weights_and_first_version_becomes_active(registry, tmp_path):
+    weights = make_run(tmp_path)
+    version, entry = registry.register(weights, version="train6", metrics={"recall": 0.6})
+    assert registry.active_version() == "train6"
+    assert entry["imgsz"] == 512 and entry["arch"] == "yolov8s"
+    assert entry["metrics"] == {"precision": 0.8, "mAP50": 0.7, "recall": 0.6}
+    assert entry["sha256"] == file_sha256(weights)
+    assert registry.weights_path("train6") != weights
+
+    # Later versions do not take over unless asked to
+    registry.register(make_run(tmp_path, "train7", with_logs=False), version="train7")
+    assert registry.active_version() == "train6"
+    assert registry.get("train7")["imgsz"] == DEFAULT_IMGSZ
+
+
+def test_register_defaults_version_to_hash_prefix(registry, tmp_path):
+    weights = make_run(tmp_path)
+    version, _ = registry.register(weights)
+    assert version == file_sha256(weights)[:12]
+
+
+def test_register_rejects_duplicates_and_missing_files(registry, tmp_path):
+    weights = make_run(tmp_path)
+    registry.register(weights, version="train6")
+    with pytest.raises(RegistryError):
+        registry.register(weights, version="train6")
+    with pytest.raises(RegistryError):
+        registry.register(str(tmp_path / "missing.pt"))
+
+
+def test_weights_path_detects_tampering_and_missing_files(registry, tmp_path):
+    registry.register(make_run(tmp_path), version="train6")
+    path = registry.weights_path("train6")
+
+    with open(path, "ab") as f:
+        f.write(b"tampered")
+    with pytest.raises(RegistryError, match="Hash mismatch"):
+        registry.weights_path("train6")
+    assert registry.weights_path("train6", verify=False) == path
+
+    os.remove(path)
+    with pytest.raises(RegistryError, match="missing"):
+        registry.weights_path("train6", verify=False)
+
+
+def test_set_active(registry, tmp_path):
+    registry.register(make_run(tmp_path, "train6"), version="train6")
+    registry.register(make_run(tmp_path, "train7"), version="train7")
+    registry.set_active("train7")
+    assert registry.active_version() == "train7"
+    with pytest.raises(VersionNotFoundError):
+        registry.set_active("nope")
+    with pytest.raises(VersionNotFoundError):
+        registry.get("nope")
+
+
+def test_resolve_weights(registry, tmp_path):
+    root = registry.root
+    assert resolve_weights(fallback="runs/best.pt", root=root) == "runs/best.pt"
+    with pytest.raises(RegistryError):
+        resolve_weights(root=root)
+
+    registry.register(make_run(tmp_path, "train6"), version="train6")
+    registry.register(make_run(tmp_path, "train7"), version="train7")
+    assert resolve_weights(fallback="runs/best.pt", root=root) == registry.weights_path("train6")
+    assert resolve_weights("train7", root=root) == registry.weights_path("train7")
+    with pytest.raises(VersionNotFoundError):
+        resolve_weights("nope", fallback="runs/best.pt", root=root)
@@ -0,0 +1,60 @@
+import zlib
+
+import cv2
+import numpy as np
+
+from render import PALETTE, Renderer, encode
+
+
+def det(cls, bbox, confidence=0.9):
+    return {"class": cls, "confidence": confidence, "bbox": bbox}
+
+
+def test_label_is_clipped_at_top_and_left_edges():
+    renderer = Renderer(names={0: "FireAlarm"})
+    frame = np.zeros((30, 30, 3), np.uint8)
+    renderer.draw(frame, [det("FireAlarm", [-5, -5, 20, 20])])
+    # The label moves inside the box and starts at the frame's corner
+    assert tuple(frame[0, 0]) == renderer.colour("FireAlarm")
+
+
+def test_label_is_clipped_at_right_and_bottom_edges():
+    renderer = Renderer(names={0: "FireAlarm"})
+    frame = np.zeros((20, 20, 3), np.uint8)
+    renderer.draw(frame, [det("FireAlarm", [18, 18, 40, 40])])
+    assert frame.shape == (20, 20, 3)
+
+
+def test_known_classes_use_palette_order_in_bgr():
+    renderer = Renderer(names=["FireAlarm", "OxygenTank"])
+    assert renderer.colour("OxygenTank") == PALETTE[1][::-1]
+    assert Renderer(names=["FireAlarm"], channel_order="rgb").colour("FireAlarm") == PALETTE[0]
+
+
+def test_unknown_class_falls_back_to_crc32_colour():
+    renderer = Renderer(names={0: "FireAlarm"})
+    expected = PALETTE[zlib.crc32(b"Mystery") % len(PALETTE)][::-1]
+    assert renderer.colour("Mystery") == expected
+    assert renderer.colour("Mystery") == expected
+
+
+def test_glyphs_are_cached_per_label():
+    renderer = Renderer()
+    assert renderer.glyph("FireAlarm", 0.5) is renderer.glyph("FireAlarm", 0.5)
+
+
+def test_encode_rgb_round_trips_colours():
+    red_rgb = np.zeros((16, 16, 3), np.uint8)
+    red_rgb[..., 0] = 255
+    data, media_type = encode(red_rgb, "jpeg", 100, channel_order="rgb")
+    assert media_type == "image/jpeg"
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    b, g, r = decoded[8, 8].astype(int)
+    assert r > 240 and g < 15 and b < 15
+
+
+def test_detect_rejects_unsupported_formats(api):
+    _, client = api
+    response = client.post("/detect?annotated=true&format=png",
+                           files={"file": ("a.jpg", b"ignored", "image/jpeg")})
+    assert response.status_code == 400
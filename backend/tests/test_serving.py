@@ -0,0 +1,235 @@
+import threading
+import time
+from contextlib import ExitStack
+
+import numpy as np
+import pytest
+
+from adaptive import CostProfile
+from registry import ModelRegistry, RegistryError
+from serving import SHADOW_BACKLOG, ModelServer, box_iou, match_rate
+
+
+def det(cls, bbox):
+    return {"class": cls, "confidence": 0.9, "bbox": bbox}
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "models"))
+    for version, imgsz in (("v1", 320), ("v2", 320)):
+        weights = tmp_path / version / "best.pt"
+        weights.parent.mkdir()
+        weights.write_bytes(version.encode())
+        registry.register(str(weights), version=version, imgsz=imgsz)
+    return registry
+
+
+@pytest.fixture
+def server(registry, fake_yolo):
+    server = ModelServer(registry, warmup_runs=0)
+    server.start()
+    yield server
+    server._shadow_pool.shutdown(wait=True)
+
+
+def start_shadow(server, version="v2", sample_rate=1.0):
+    server.start_shadow(version, sample_rate)
+    wait_for(lambda: server.shadow_status["state"] == "running")
+    return server._shadow
+
+
+def test_box_iou():
+    assert box_iou([0, 0, 10, 10], [0, 0, 10, 10]) == pytest.approx(1.0)
+    assert box_iou([0, 0, 10, 10], [5, 0, 15, 10]) == pytest.approx(50 / 150)
+    assert box_iou([0, 0, 10, 10], [20, 20, 30, 30]) == 0.0
+    assert box_iou([0, 0, 0, 0], [0, 0, 0, 0]) == 0.0
+
+
+def test_match_rate_needs_same_class_and_overlap():
+    primary = [det("FireAlarm", [0, 0, 10, 10]), det("OxygenTank", [20, 20, 30, 30])]
+    candidate = [det("FireAlarm", [1, 0, 11, 10]), det("NitrogenTank", [20, 20, 30, 30])]
+    assert match_rate(primary, candidate) == pytest.approx(0.5)
+
+
+def test_match_rate_with_no_primary_detections():
+    assert match_rate([], []) == 1.0
+    assert match_rate([], [det("FireAlarm", [0, 0, 10, 10])]) == 0.0
+
+
+def test_slow_shadow_skips_samples_instead_of_queueing_frames(server):
+    shadow, stats = start_shadow(server)
+    release = threading.Event()
+    predict = shadow.model.predict
+    shadow.model.predict = lambda *args, **kwargs: release.wait() and predict(*args, **kwargs)
+
+    frame = np.zeros((32, 32, 3), np.uint8)
+    handed = [server.maybe_shadow(frame, [], 1.0) for _ in range(SHADOW_BACKLOG + 3)]
+    assert handed.count(True) == SHADOW_BACKLOG
+    assert stats.summary()["skipped"] == 3
+
+    release.set()
+    wait_for(lambda: stats.summary()["samples"] == SHADOW_BACKLOG)
+    # Slots free up once the backlog has drained
+    assert server.maybe_shadow(frame, [], 1.0) is True
+
+
+def test_activate_swaps_then_drains_the_old_model(server, registry):
+    with server.acquire() as old:
+        server.activate("v2")
+        wait_for(lambda: server.reload_status["state"] == "draining")
+        # New requests already get v2 while the pinned one finishes on v1
+        assert server.current.version == "v2"
+        assert old.version == "v1" and old.inflight == 1
+    wait_for(lambda: server.reload_status["state"] == "done")
+
+    assert server.reload_status["drained"] is True
+    assert registry.active_version() == "v2"
+    assert "v1" not in server.costs.table()
+
+
+def test_activate_rejects_a_second_concurrent_reload(server):
+    server._reload_lock.acquire()
+    try:
+        with pytest.raises(RegistryError, match="in progress"):
+            server.activate("v2")
+    finally:
+        server._reload_lock.release()
+
+
+def gate_loads(server, monkeypatch):
+    """Blocks background loads until ``release`` is set; ``loaded`` counts finished loads."""
+    release, done = threading.Event(), []
+    load = server._load
+
+    def gated(version):
+        release.wait()
+        loaded = load(version)
+        done.append(version)
+        return loaded
+
+    monkeypatch.setattr(server, "_load", gated)
+    return release, done
+
+
+def test_stop_discards_a_shadow_still_loading(server, monkeypatch):
+    release, done = gate_loads(server, monkeypatch)
+    server.start_shadow("v2", 1.0)
+    server.stop_shadow()
+    release.set()
+    wait_for(lambda: done == ["v2"])
+    time.sleep(0.05)
+
+    assert server._shadow is None
+    assert server.shadow_summary() == {"state": "idle"}
+
+
+def test_newer_shadow_wins_over_an_older_slower_load(server, monkeypatch):
+    release, done = gate_loads(server, monkeypatch)
+    server.start_shadow("v2", 1.0)
+    server.start_shadow("v1", 0.5)
+    release.set()
+    wait_for(lambda: len(done) == 2)
+    wait_for(lambda: server.shadow_status["state"] == "running")
+
+    shadow, stats = server._shadow
+    assert shadow.version == stats.version == "v1"
+    assert server.shadow_summary()["sample_rate"] == 0.5
+
+
+def test_shadow_profiles_stay_out_of_the_live_planner(server):
+    start_shadow(server, "v2")
+    assert "v2" not in server.costs.table()
+    assert server.status()["queue_ms"] == {"v1": 0.0}
+
+
+def set_costs(server, version, rows):
+    profile = CostProfile()
+    for imgsz, ms in rows.items():
+        profile.observe(version, imgsz, ms)
+    server.costs.adopt(profile, version)
+
+
+def test_concurrent_picks_step_down_before_inference_starts(server):
+    set_costs(server, "v1", {320: 20.0, 256: 12.0, 224: 8.0, 192: 5.0, 160: 3.0})
+    with ExitStack() as requests:
+        # Nothing has reached predict yet: each pick alone must make the next one see more queue
+        picks = [requests.enter_context(server.acquire_for_budget(45)) for _ in range(5)]
+        assert [imgsz for _, imgsz, _ in picks] == [320, 320, 192, 160, 160]
+        assert [plan["queue_ms"] for _, _, plan in picks] == [0.0, 20.0, 40.0, 45.0, 48.0]
+        assert picks[-1][2]["over_budget"] is True
+    assert server.current.queue_ms == 0.0
+
+
+def test_concurrent_picks_spill_onto_an_idle_variant(server):
+    server.add_variant("v2")
+    wait_for(lambda: "v2" in server.variant_versions())
+    set_costs(server, "v1", {320: 20.0})
+    set_costs(server, "v2", {320: 20.0})
+    with ExitStack() as requests:
+        picks = [requests.enter_context(server.acquire_for_budget(30)) for _ in range(3)]
+        assert [model.version for model, _, _ in picks] == ["v1", "v2", "v1"]
+        assert picks[2][2]["over_budget"] is True
+
+
+def test_reserved_predict_does_not_double_count(server):
+    set_costs(server, "v1", {320: 20.0})
+    with server.acquire_for_budget(100) as (loaded, imgsz, _):
+        seen = []
+        predict = loaded.model.predict
+        loaded.model.predict = lambda *a, **k: seen.append(loaded.queue_ms) or predict(*a, **k)
+        loaded.predict(np.zeros((32, 32, 3), np.uint8), imgsz=imgsz, reserved=True)
+    assert seen == [20.0]
+    assert loaded.queue_ms == 0.0
+
+
+def test_predict_timed_excludes_the_wait_for_the_predict_lock(server):
+    loaded = server.current
+    loaded._predict_lock.acquire()
+    threading.Timer(0.2, loaded._predict_lock.release).start()
+    start = time.perf_counter()
+    _, elapsed_ms = loaded.predict_timed(np.zeros((32, 32, 3), np.uint8))
+    assert (time.perf_counter() - start) * 1000 >= 150
+    assert elapsed_ms < 100
+
+
+def test_add_variant_loads_in_the_background(server, monkeypatch):
+    release, done = gate_loads(server, monkeypatch)
+    assert server.add_variant("v2") == {"state": "loading", "version": "v2"}
+    with pytest.raises(RegistryError, match="already loading"):
+        server.add_variant("v2")
+    assert server.variant_versions() == []
+
+    release.set()
+    wait_for(lambda: server.status()["variants"] == {"v2": {"state": "ready", "version": "v2"}})
+    assert server.variant_versions() == ["v2"]
+    assert "v2" in server.costs.table()
+
+
+def test_remove_variant_forgets_its_costs(server):
+    server.add_variant("v2")
+    wait_for(lambda: server.variant_versions() == ["v2"])
+    assert server.remove_variant("v2") == []
+    assert "v2" not in server.costs.table()
+    assert "v1" in server.costs.table()
+    with pytest.raises(RegistryError):
+        server.remove_variant("v2")
+
+
+def test_variant_removed_while_loading_is_never_installed(server, monkeypatch):
+    release, done = gate_loads(server, monkeypatch)
+    server.add_variant("v2")
+    server.remove_variant("v2")
+    release.set()
+    wait_for(lambda: done == ["v2"])
+    time.sleep(0.05)
+    assert server.variant_versions() == []
+    assert server.status()["variants"] == {}
@@ -3,9 +3,17 @@ from ultralytics import YOLO
 import cv2
 import numpy as np
 from PIL import Image, ImageOps
+import pandas as pd
 import os
+import sys
 import time
 import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from registry import RegistryError, resolve_weights
+from render import Renderer, encode
 
 # -----------------------------
 # Page Configuration
@@ -24,6 +32,10 @@ st.set_page_config(
 if 'theme' not in st.session_state:
     st.session_state.theme = 'light_blue'
 
+# Batch results survive reruns (theme switches call st.rerun())
+if 'batch' not in st.session_state:
+    st.session_state.batch = None
+
 def set_theme(theme_name):
     st.session_state.theme = theme_name
     st.rerun()
@@ -227,13 +239,23 @@ st.markdown(f"""
 # -----------------------------
 @st.cache_resource
 def load_model():
-    path = "runs/detect/train6/weights/best.pt"
+    # Registry's active version first, then the committed training run
+    try:
+        path = resolve_weights(fallback="runs/detect/train6/weights/best.pt")
+    except RegistryError as e:
+        st.warning(f"Model registry unavailable ({e}), using training run weights")
+        path = "runs/detect/train6/weights/best.pt"
     if os.path.exists(path):
         return YOLO(path)
     return YOLO("yolov8n.pt")
 
 model = load_model()
 
+@st.cache_resource
+def load_renderer(_model_names):
+    # Colours and label glyphs are cached on the renderer across reruns
+    return Renderer(names=_model_names, channel_order="rgb")
+
 def optimize_image(image, max_size=1280):
     """
     Optimizes image for faster processing by resizing if too large.
@@ -286,42 +308,92 @@ def filter_empty_boxes(boxes, min_area=10):
 
 def draw_boxes_on_image(image, boxes, model_names, conf_threshold=0.25):
     """
-    Manually draw only valid boxes on the image to avoid empty boxes.
+    Draws only valid boxes straight into the RGB pixel buffer and encodes the
+    result once as JPEG, so Streamlit can display the bytes as-is.
     """
-    # Convert PIL to numpy array
-    img_array = np.array(image)
-    img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-    
-    # Filter valid boxes
-    valid_boxes = filter_empty_boxes(boxes, min_area=10)
-    
-    # Draw only valid boxes
-    for box in valid_boxes:
-        # Get coordinates
-        xyxy = box.xyxy[0].cpu().numpy() if hasattr(box.xyxy[0], 'cpu') else box.xyxy[0]
-        x1, y1, x2, y2 = map(int, xyxy)
-        
-        # Get class and confidence
-        cls_id = int(box.cls[0].cpu().numpy()) if hasattr(box.cls[0], 'cpu') else int(box.cls[0])
+    frame = np.array(image.convert("RGB"))
+
+    detections = []
+    for box in filter_empty_boxes(boxes, min_area=10):
         conf = float(box.conf[0].cpu().numpy()) if hasattr(box.conf[0], 'cpu') else float(box.conf[0])
-        
         if conf >= conf_threshold:
-            # Get class name
-            class_name = model_names[cls_id]
-            
-            # Draw rectangle
-            color = (0, 255, 0)  # Green color
-            cv2.rectangle(img_cv, (x1, y1), (x2, y2), color, 2)
-            
-            # Draw label
-            label = f"{class_name} {conf:.2f}"
-            (text_width, text_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-            cv2.rectangle(img_cv, (x1, y1 - text_height - 10), (x1 + text_width, y1), color, -1)
-            cv2.putText(img_cv, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-    
-    # Convert back to RGB
-    img_rgb = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-    return Image.fromarray(img_rgb)
+            cls_id = int(box.cls[0].cpu().numpy()) if hasattr(box.cls[0], 'cpu') else int(box.cls[0])
+            xyxy = box.xyxy[0].cpu().numpy() if hasattr(box.xyxy[0], 'cpu') else box.xyxy[0]
+            detections.append({"class": model_names[cls_id], "confidence": conf, "bbox": xyxy})
+
+    renderer = load_renderer(model_names)
+    content, _ = encode(renderer.draw(frame, detections), "jpeg", 90, channel_order="rgb")
+    return content
+
+
+# -----------------------------
+# Batch Analysis
+# -----------------------------
+BATCH_SIZE = 8
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+def expand_uploads(uploaded_files):
+    """
+    Flattens uploaded images and zip archives into (name, bytes) pairs.
+    """
+    items = []
+    for uploaded in uploaded_files:
+        data = uploaded.getvalue()
+        if uploaded.name.lower().endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for name in sorted(archive.namelist()):
+                    if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('__MACOSX/'):
+                        items.append((f"{uploaded.name}/{name}", archive.read(name)))
+        else:
+            items.append((uploaded.name, data))
+    return items
+
+def decode_image(data):
+    try:
+        return optimize_image(Image.open(io.BytesIO(data)).convert("RGB"))
+    except Exception:
+        return None
+
+def decode_batch(items, workers=8):
+    """
+    Decodes images in parallel. Pillow releases the GIL while decoding and
+    resizing, so threads give real parallelism here.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(decode_image, (data for _, data in items)))
+
+def analyze_batch(names, images, progress_bar, conf_threshold=0.25):
+    """
+    Runs batched inference and returns per-image summary rows plus the
+    annotated JPEG bytes for the gallery.
+    """
+    rows, gallery = [], []
+    total = len(images)
+    for start in range(0, total, BATCH_SIZE):
+        chunk_names = names[start:start + BATCH_SIZE]
+        chunk_images = images[start:start + BATCH_SIZE]
+        results = model.predict(
+            source=chunk_images,
+            save=False,
+            conf=conf_threshold,
+            imgsz=640,
+            verbose=False
+        )
+        for name, image, result in zip(chunk_names, chunk_images, results):
+            counts = {}
+            for box in filter_empty_boxes(result.boxes):
+                cls_id = int(box.cls[0].cpu().numpy()) if hasattr(box.cls[0], 'cpu') else int(box.cls[0])
+                class_name = model.names[cls_id]
+                counts[class_name] = counts.get(class_name, 0) + 1
+            rows.append({"Image": name, "Detections": sum(counts.values()), **counts})
+            gallery.append((name, counts, draw_boxes_on_image(image, result.boxes, model.names, conf_threshold)))
+
+        done = min(start + BATCH_SIZE, total)
+        progress_bar.progress(done / total, text=f"Analyzed {done}/{total} images")
+    return rows, gallery
+
+def batch_signature(uploaded_files):
+    return tuple((f.name, f.size) for f in uploaded_files)
 
 
 # -----------------------------
@@ -360,31 +432,133 @@ with col_left:
     st.markdown("### 🎛️ Control Center")
     st.write("Upload mission imagery for automated defect analysis.")
     
-    # File upload
-    uploaded_file = st.file_uploader("Choose an image", type=['jpg', 'png', 'jpeg'], help="Upload an image file for analysis")
+    analysis_mode = st.radio("Analysis mode", ["Single Image", "Batch"], horizontal=True)
     image_source = None
-    
-    if uploaded_file is not None:
-        try:
-            # Read image directly from bytes for faster processing
-            image_bytes = uploaded_file.read()
-            image_source = Image.open(io.BytesIO(image_bytes))
-            # Optimize image size for faster processing
-            image_source = optimize_image(image_source)
-            st.success("Image Loaded Successfully")
-        except Exception as e:
-            st.error(f"Error loading image: {str(e)}")
-            image_source = None
-    
-    # Analyze button
-    analyze_clicked = st.button("🔍 Analyze Image", type="primary", use_container_width=True)
-    
+    analyze_clicked = False
+
+    if analysis_mode == "Batch":
+        batch_files = st.file_uploader(
+            "Choose images or a zip archive",
+            type=['jpg', 'png', 'jpeg', 'zip'],
+            accept_multiple_files=True,
+            help="Upload a whole survey pass at once"
+        )
+        batch_clicked = st.button("🔍 Analyze Batch", type="primary", use_container_width=True)
+
+        if batch_clicked and batch_files:
+            signature = batch_signature(batch_files)
+            cached = st.session_state.batch
+            if cached is None or cached["signature"] != signature:
+                try:
+                    start = time.time()
+                    items = expand_uploads(batch_files)
+                    images = decode_batch(items)
+                    failed = [name for (name, _), image in zip(items, images) if image is None]
+                    names = [name for (name, _), image in zip(items, images) if image is not None]
+                    images = [image for image in images if image is not None]
+
+                    rows, gallery = [], []
+                    if images:
+                        progress_bar = st.progress(0.0, text=f"Analyzing {len(images)} images...")
+                        rows, gallery = analyze_batch(names, images, progress_bar)
+                    st.session_state.batch = {
+                        "signature": signature,
+                        "rows": rows,
+                        "gallery": gallery,
+                        "failed": failed,
+                        "elapsed": time.time() - start
+                    }
+                except Exception as e:
+                    st.error(f"Error processing batch: {str(e)}")
+        elif batch_clicked:
+            st.warning("Upload images or a zip archive first.")
+
+        if st.session_state.batch is not None and st.button("🗑️ Clear Results", use_container_width=True):
+            st.session_state.batch = None
+    else:
+        # File upload
+        uploaded_file = st.file_uploader("Choose an image", type=['jpg', 'png', 'jpeg'], help="Upload an image file for analysis")
+
+        if uploaded_file is not None:
+            try:
+                # Read image directly from bytes for faster processing
+                image_bytes = uploaded_file.read()
+                image_source = Image.open(io.BytesIO(image_bytes))
+                # Optimize image size for faster processing
+                image_source = optimize_image(image_source)
+                st.success("Image Loaded Successfully")
+            except Exception as e:
+                st.error(f"Error loading image: {str(e)}")
+                image_source = None
+
+        # Analyze button
+        analyze_clicked = st.button("🔍 Analyze Image", type="primary", use_container_width=True)
+
     st.markdown('</div>', unsafe_allow_html=True)
 
 
 with col_right:
+    batch = st.session_state.batch
+    if analysis_mode == "Batch" and batch is not None:
+        st.markdown('<div class="glass-card" style="min-height: 500px;">', unsafe_allow_html=True)
+        st.markdown("### 🗂️ Batch Analysis Summary")
+
+        rows = batch["rows"]
+        class_names = list(model.names.values())
+        summary = pd.DataFrame(rows, columns=["Image", "Detections"] + class_names).fillna(0)
+        summary[["Detections"] + class_names] = summary[["Detections"] + class_names].astype(int)
+
+        totals = summary[class_names].sum()
+        st.markdown('<div class="metric-container">', unsafe_allow_html=True)
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-value">{len(rows)}</div>
+            <div class="metric-label">Images Analyzed</div>
+        </div>
+        <div class="metric-card">
+            <div class="metric-value">{int(summary["Detections"].sum())}</div>
+            <div class="metric-label">Total Detections</div>
+        </div>
+        <div class="metric-card">
+            <div class="metric-value">{batch["elapsed"]:.1f}s</div>
+            <div class="metric-label">Processing Time</div>
+        </div>
+        """, unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        if batch["failed"]:
+            st.warning(f"Skipped {len(batch['failed'])} unreadable file(s): {', '.join(batch['failed'][:10])}")
+
+        # Per-class totals and per-image table (click a column header to sort)
+        st.markdown("#### 📊 Per-Class Totals")
+        st.dataframe(totals.rename("Detections").to_frame(), use_container_width=True)
+        st.markdown("#### 📋 Per-Image Results")
+        st.dataframe(summary, use_container_width=True, hide_index=True)
+
+        # Gallery
+        st.markdown("#### 🖼️ Gallery")
+        class_filter = st.multiselect("Show images containing", class_names)
+        shown = [item for item in batch["gallery"]
+                 if not class_filter or any(item[1].get(c) for c in class_filter)]
+        per_page = 12
+        pages = max(1, (len(shown) + per_page - 1) // per_page)
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+        gallery_cols = st.columns(3)
+        for i, (name, counts, image_bytes) in enumerate(shown[(page - 1) * per_page:page * per_page]):
+            with gallery_cols[i % 3]:
+                st.image(image_bytes, caption=f"{name} ({sum(counts.values())})", use_container_width=True)
+
+        st.markdown('</div>', unsafe_allow_html=True)
+    elif analysis_mode == "Batch":
+        st.markdown("""
+        <div style="text-align: center; padding: 50px 0; opacity: 0.6;">
+            <div style="font-size: 60px; margin-bottom: 15px;">🗂️</div>
+            <h3>Upload a Survey Pass to Begin Batch Analysis</h3>
+            <p style="font-size: 1.1em;">Select multiple images or a zip archive, then click 'Analyze Batch'</p>
+        </div>
+        """, unsafe_allow_html=True)
     # Only show the visualization card when there's content and analyze is clicked
-    if image_source and analyze_clicked:
+    elif image_source and analyze_clicked:
         st.markdown('<div class="glass-card" style="min-height: 500px;">', unsafe_allow_html=True)
         st.markdown("### 👁️ Visual Analysis Feed")
         
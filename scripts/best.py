@@ -1,15 +1,25 @@
 import streamlit as st
 from ultralytics import YOLO
 import os
+import sys
 import cv2
 
-MODEL_PATH = "runs/detect/train6/weights/best.pt"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from registry import RegistryError, resolve_weights
+
+# Used when the model registry has no active version
+FALLBACK_MODEL_PATH = "runs/detect/train6/weights/best.pt"
 
 def load_model():
-    if not os.path.exists(MODEL_PATH):
-        st.error(f"❌ Model file not found: {MODEL_PATH}")
+    try:
+        model_path = resolve_weights(fallback=FALLBACK_MODEL_PATH)
+    except RegistryError as e:
+        st.error(f"❌ {e}")
+        return None
+    if not os.path.exists(model_path):
+        st.error(f"❌ Model file not found: {model_path}")
         return None
-    return YOLO(MODEL_PATH)
+    return YOLO(model_path)
 
 def run_inference(model, file_path):
     results = model.predict(source=file_path, conf=0.25, save=True)
@@ -1,9 +1,19 @@
 from ultralytics import YOLO
+import argparse
+import os
+import sys
 import numpy as np
 import pandas as pd
 
-# ✅ Load trained model
-model = YOLO("D:/ml2/runs/detect/train/weights/best.pt")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from registry import resolve_weights
+
+parser = argparse.ArgumentParser(description="Evaluate a registered model on the test split")
+parser.add_argument("--version", help="Registry version to evaluate (default: the active one)")
+args = parser.parse_args()
+
+# ✅ Load trained model (registry version, else the local training run)
+model = YOLO(resolve_weights(args.version, fallback="D:/ml2/runs/detect/train/weights/best.pt"))
 
 # ✅ Run validation on test split
 metrics = model.val(
@@ -1,11 +1,22 @@
 from ultralytics import YOLO
+import argparse
+import os
+import sys
 
-# Load model
-model = YOLO("D:/ml2/runs/space_station_safety/weights/best.pt")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from registry import resolve_weights
+
+parser = argparse.ArgumentParser(description="Run predictions with a registered model")
+parser.add_argument("--version", help="Registry version to use (default: the active one)")
+parser.add_argument("--source", default="D:/ml2/data/test/images", help="Image, folder or video to predict on")
+args = parser.parse_args()
+
+# Load model (registry version, else the local training run)
+model = YOLO(resolve_weights(args.version, fallback="D:/ml2/runs/space_station_safety/weights/best.pt"))
 
 # Run prediction on test images
 results = model.predict(
-    source="D:/ml2/data/test/images",
+    source=args.source,
     imgsz=256,
     conf=0.15,
     augment=True